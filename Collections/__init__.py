@@ -1,2 +1,7 @@
 from .dicts import Dictionary as dictionary
 from .dicts import DefaultDict as defaultdict
+
+try:
+    from .intdicts import IntDictionary as intdictionary
+except ImportError:  # numpy and numba are optional
+    pass
@@ -0,0 +1,38 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Compiled probe loop for Dictionary
+
+Build in place with `cythonize -i Collections/_cdict.pyx`. When the extension is not built
+`Collections.dicts` uses its pure Python `_probe` instead.
+
+:copyright: (c) 2024 by Dan Shernicoff
+"""
+
+
+cpdef Py_ssize_t probe(list indices, list hashes, list keys, object key, unsigned long long key_hash, int shift,
+                       Py_ssize_t mask):
+    """
+    Walk the Robin Hood probe chain for `key` in an index table.
+
+    Returns the slot pointing at the key's entry if present. Otherwise returns `-1 - slot` where `slot`
+    is where the key belongs: the first empty slot, or the first slot whose entry is closer to its home
+    slot than the key would be.
+    """
+    cdef Py_ssize_t idx = <Py_ssize_t>(key_hash >> shift)
+    cdef Py_ssize_t distance = 0
+    cdef Py_ssize_t position
+    cdef unsigned long long stored_hash
+    cdef object entry, stored_key
+    while True:
+        entry = indices[idx]
+        if entry is None:
+            return -1 - idx
+        position = entry
+        stored_hash = hashes[position]
+        if ((idx - <Py_ssize_t>(stored_hash >> shift)) & mask) < distance:
+            return -1 - idx
+        stored_key = keys[position]
+        if stored_key is key or (stored_hash == key_hash and stored_key == key):
+            return idx
+        idx = (idx + 1) & mask
+        distance += 1
@@ -4,87 +4,245 @@ Assorted dictionary types
 :copyright: (c) 2024 by Dan Shernicoff
 """
 from collections.abc import Iterable, Callable
+from itertools import repeat
 from typing import Any
 
+_DUMMY = object()  # Marks a deleted entry until the next resize drops it
+_MISSING = object()  # Default for lookups where None is a valid value
+_GOLDEN = 0x9E3779B97F4A7C15  # 2**64 divided by the golden ratio
+_MASK64 = (1 << 64) - 1
+
+
+def _fib_hash(key: Any) -> int:
+    """
+    Get the Fibonacci hash of a key as an unsigned 64 bit int.
+
+    Multiplying by `_GOLDEN` mixes every bit of `hash(key)` into the high bits, so sequential ints do not
+    end up in one long run. A table with 2**n slots uses the top n bits as the key's home slot.
+    """
+    return (hash(key) * _GOLDEN) & _MASK64
+
+
+def _probe(indices: list, hashes: list, keys: list, key: Any, key_hash: int, shift: int, mask: int) -> int:
+    """
+    Walk the Robin Hood probe chain for `key` in an index table.
+
+    Returns the slot pointing at the key's entry if present. Otherwise returns `-1 - slot` where `slot`
+    is where the key belongs: the first empty slot, or the first slot whose entry is closer to its home
+    slot than the key would be. Entries in a run are ordered by home slot so the walk can stop there.
+    """
+    idx = key_hash >> shift
+    distance = 0
+    while True:
+        position = indices[idx]
+        if position is None or (idx - (hashes[position] >> shift)) & mask < distance:
+            return -1 - idx
+        stored_key = keys[position]
+        if stored_key is key or (hashes[position] == key_hash and stored_key == key):
+            return idx
+        idx = (idx + 1) & mask
+        distance += 1
+
+
+def _insert_at(indices: list, idx: int, position: int, mask: int):
+    """ Point slot `idx` at `position`, shifting the rest of the run forward one slot """
+    while position is not None:
+        indices[idx], position = position, indices[idx]
+        idx = (idx + 1) & mask
+
+
+def _remove_at(indices: list, hashes: list, idx: int, shift: int, mask: int):
+    """ Empty slot `idx`, shifting the rest of the run back until an entry is in its home slot """
+    following = (idx + 1) & mask
+    while indices[following] is not None and (following - (hashes[indices[following]] >> shift)) & mask:
+        indices[idx] = indices[following]
+        idx, following = following, (following + 1) & mask
+    indices[idx] = None
+
+
+try:
+    from ._cdict import probe as _probe
+except ImportError:  # The Cython extension has not been built, use the pure Python probe
+    pass
+
 
 class Dictionary:
     """
     Basic Dictionary class.
     """
+    __slots__ = ('len', 'max_len', 'mask', 'shift', 'multiplier', 'indices', '_hashes', '_keys', '_values')
+
     START_LEN = 4
     MULTIPLIER = 2
+    MAX_LOAD = 0.7
 
     def __init__(self, kv_pairs: Iterable = None, max_len: int = START_LEN, multiplier: int = MULTIPLIER):
-        self.len = 0
-        self.max_len = max_len
+        if max_len < 2 or max_len & (max_len - 1):
+            # A single slot would need a 64 bit shift to find its home slot, which C does not define
+            raise ValueError('max_len must be a power of 2 of at least 2')
+        if multiplier < 2 or multiplier & (multiplier - 1):
+            raise ValueError('multiplier must be a power of 2 of at least 2')
         self.multiplier = multiplier
-        self.store = [(None, None) for _ in range(self.max_len)]
-        self.iterators = -1
-        self._kwargs_ = {}
+        if hasattr(kv_pairs, '__len__'):
+            # Allocate enough slots up front so loading the pairs never resizes
+            max_len = max(max_len, self._size_for(len(kv_pairs)))
+        self._init_store(max_len)
         if kv_pairs:
-            if isinstance(kv_pairs, dict):
-                for key, value in kv_pairs.items():
-                    self[key] = value
-            else:
-                for key, value in kv_pairs:
-                    self[key] = value
+            self._bulk_insert(kv_pairs.items() if isinstance(kv_pairs, dict) else kv_pairs)
+
+    @classmethod
+    def _size_for(cls, count: int) -> int:
+        """ Get the smallest power of 2 table size that holds `count` entries under MAX_LOAD """
+        return 1 << int(count / cls.MAX_LOAD).bit_length()
+
+    def _init_store(self, max_len: int):
+        """ Set up an empty index table with `max_len` slots """
+        assert max_len >= 2, 'max_len must be at least 2'
+        self.len = 0
+        self.max_len = max_len
+        self.mask = max_len - 1
+        self.shift = 65 - max_len.bit_length()
+        self.indices = [None] * max_len
+        self._hashes = []
+        self._keys = []
+        self._values = []
+
+    def _find_slot(self, key: Any, key_hash: int = None) -> int:
+        """
+        Find the slot in the index table for a key using Robin Hood probing.
+
+        Returns the slot pointing at the key's entry if present, otherwise `-1 - slot` for the slot the
+        key should be inserted at. Pass `key_hash` if the Fibonacci hash has already been computed.
+        """
+        if key_hash is None:
+            key_hash = _fib_hash(key)
+        return _probe(self.indices, self._hashes, self._keys, key, key_hash, self.shift, self.mask)
+
+    def _key_slot(self, key: Any) -> int:
+        """ Get the slot pointing at the key's entry or -1 if it is not in the dictionary """
+        idx = self._find_slot(key)
+        return idx if idx >= 0 else -1
+
+    def _lookup(self, key: Any) -> int:
+        """ Get the position of the key's entry or -1 if it is not in the dictionary """
+        idx = self._key_slot(key)
+        return self.indices[idx] if idx >= 0 else -1
+
+    def _resize(self, new_size: int):
+        """ Rebuild the index table with `new_size` slots, dropping deleted entries """
+        assert new_size & (new_size - 1) == 0, 'new_size must be a power of 2'
+        if self.len != len(self._keys):
+            live = [i for i, key in enumerate(self._keys) if key is not _DUMMY]
+            self._hashes = [self._hashes[i] for i in live]
+            self._keys = [self._keys[i] for i in live]
+            self._values = [self._values[i] for i in live]
+        indices = [None] * new_size
+        mask = new_size - 1
+        shift = 65 - new_size.bit_length()
+        hashes = self._hashes
+        for position, key_hash in enumerate(hashes):
+            idx = key_hash >> shift
+            distance = 0
+            while indices[idx] is not None and (idx - (hashes[indices[idx]] >> shift)) & mask >= distance:
+                idx = (idx + 1) & mask
+                distance += 1
+            _insert_at(indices, idx, position, mask)
+        self.indices = indices
+        self.max_len = new_size
+        self.mask = mask
+        self.shift = shift
+
+    def _make_room(self):
+        """ Resize before adding an entry, growing only if the live entries need it """
+        if (self.len + 1) / self.max_len > self.MAX_LOAD:
+            self._resize(self.max_len * self.multiplier)
+        else:
+            self._resize(self.max_len)
 
     def __setitem__(self, key, value):
         """ Add item to the dictionary """
         if key is None:
             raise ValueError('Key cannot be None')
-        if self.len >= self.max_len:
-            new_dict = self.__class__(kv_pairs=self._get_values(), max_len=self.max_len*self.multiplier,
-                                      **self._kwargs_)
-            self.len = new_dict.len
-            self.max_len = new_dict.max_len
-            self.store = new_dict.store
-        key_hash = hash(key) % self.max_len
-        if self.store[key_hash][0] == key or self.store[key_hash][0] is None:
-            self.store[key_hash] = (key, value)
-            self.len += 1
-        else:
-            new_dict = self.__class__(kv_pairs=self._get_values(), max_len=self.max_len*self.multiplier,
-                                      **self._kwargs_)
-            self.len = new_dict.len
-            self.max_len = new_dict.max_len
-            self.store = new_dict.store
-            self[key] = value
+        key_hash = _fib_hash(key)
+        idx = self._find_slot(key, key_hash)
+        if idx >= 0:
+            # Overwriting an existing key never changes the size or load of the table
+            self._values[self.indices[idx]] = value
+            return
+        if (self.len + 1) / self.max_len > self.MAX_LOAD or len(self._keys) >= self.max_len:
+            self._make_room()
+            idx = self._find_slot(key, key_hash)
+        self.len += 1
+        _insert_at(self.indices, -1 - idx, len(self._keys), self.mask)
+        self._hashes.append(key_hash)
+        self._keys.append(key)
+        self._values.append(value)
+
+    def _bulk_insert(self, kv_pairs: Iterable, count: int = None):
+        """
+        Add many pairs at once.
+
+        The table is resized at most once, up front, so the loop itself skips the per-item load check
+        and works on local references instead of attributes. Pass `count` if `kv_pairs` is an iterator
+        whose length is already known.
+        """
+        if count is None:
+            if not hasattr(kv_pairs, '__len__'):
+                kv_pairs = list(kv_pairs)
+            count = len(kv_pairs)
+        if (self.len + count) / self.max_len > self.MAX_LOAD or len(self._keys) + count > self.max_len:
+            self._resize(max(self.max_len, self._size_for(self.len + count)))
+        indices, hashes, keys, values = self.indices, self._hashes, self._keys, self._values
+        shift, mask = self.shift, self.mask
+        length = self.len
+        try:
+            for key, value in kv_pairs:
+                if key is None:
+                    raise ValueError('Key cannot be None')
+                key_hash = _fib_hash(key)
+                idx = _probe(indices, hashes, keys, key, key_hash, shift, mask)
+                if idx >= 0:
+                    values[indices[idx]] = value
+                else:
+                    length += 1
+                    _insert_at(indices, -1 - idx, len(keys), mask)
+                    hashes.append(key_hash)
+                    keys.append(key)
+                    values.append(value)
+        finally:
+            self.len = length
 
     def __getitem__(self, key):
         """ Get item from the dictionary """
-        key_hash = hash(key) % self.max_len
-        if self.store[key_hash][0] == key:
-            return self.store[key_hash][1]
+        position = self._lookup(key)
+        if position >= 0:
+            return self._values[position]
         if hasattr(self, '__missing__'):
             return self.__missing__(key)
         raise KeyError(f'{key} not found in {self.__class__.__name__}')
 
+    def _remove(self, idx: int) -> Any:
+        """ Remove the entry referenced by slot `idx` and return its value """
+        position = self.indices[idx]
+        value = self._values[position]
+        _remove_at(self.indices, self._hashes, idx, self.shift, self.mask)
+        self._keys[position] = _DUMMY
+        self._values[position] = None
+        self.len -= 1
+        return value
+
     def __delitem__(self, key):
         """ Delete item from the dictionary """
-        key_hash = hash(key) % self.max_len
-        if self.store[key_hash][0] != key:
+        idx = self._key_slot(key)
+        if idx < 0:
             raise KeyError(f'{key} not found in {self.__class__.__name__}')
-        self.store[key_hash] = (None, None)
-        self.len -= 1
+        self._remove(idx)
 
     def __iter__(self):
         """ Iterate over the dictionary """
-        self.iterators = 0
-        return self
-
-    def __next__(self):
-        """ Get next item from the dictionary """
-        if self.iterators > self.max_len or self.iterators < 0:
-            self.iterators = -1
-            raise StopIteration
-        while self.iterators < self.max_len:
-            if self.store[self.iterators][0] is not None:
-                self.iterators += 1
-                return self.store[self.iterators -1]
-            self.iterators += 1
-        self.iterators = -1
-        raise StopIteration
+        for key, value in zip(self._keys, self._values):
+            if key is not _DUMMY:
+                yield key, value
 
     def __repr__(self):
         """ Print out the dictionary as a representation """
@@ -97,10 +255,31 @@ class Dictionary:
         s += '\n}'
         return s
 
+    def __eq__(self, other):
+        """ Check if the dictionary holds the same items as another dictionary """
+        if isinstance(other, Dictionary):
+            get = other._get
+        elif isinstance(other, dict):
+            get = other.get
+        else:
+            return NotImplemented
+        if len(self) != len(other):
+            return False
+        for key, value in self:
+            stored = get(key, _MISSING)
+            # Check identity first, like dict does, so a value that is not equal to itself (NaN) still matches
+            if stored is not value and stored != value:
+                return False
+        return True
+
+    def __ior__(self, other):
+        """ Update the dictionary in place with `|=` """
+        self.update(other)
+        return self
+
     def __contains__(self, key):
         """ Check if a key is in the dictionary """
-        key_hash = hash(key) % self.max_len
-        return self.store[key_hash][0] == key
+        return self._lookup(key) >= 0
 
     def __len__(self):
         """ Return the length of the dictionary """
@@ -108,10 +287,7 @@ class Dictionary:
 
     def clear(self):
         """ Clear the dictionary """
-        self.max_len = self.START_LEN
-        self.store = [(None, None) for _ in range(self.multiplier)]
-        self.len = 0
-        self.iterators = -1
+        self._init_store(self.START_LEN)
 
     def copy(self):
         return self.__class__(self)
@@ -119,25 +295,53 @@ class Dictionary:
     @staticmethod
     def fromkeys(keys: Iterable[Any], value: Any = None):
         """ Create a new dictionary from a set of keys """
-        return Dictionary(((k, value) for k in keys))
+        if not hasattr(keys, '__len__'):
+            keys = list(keys)
+        new_dict = Dictionary(max_len=max(Dictionary.START_LEN, Dictionary._size_for(len(keys))))
+        new_dict._bulk_insert(zip(keys, repeat(value)), len(keys))
+        return new_dict
 
     def pop(self, key: Any, default: Any = None) -> Any:
         """ Remove and return the value from the dictionary """
-        key_hash = hash(key) % self.max_len
-        if self.store[key_hash][0] == key:
-            value = self.store[key_hash][1]
-            self.store[key_hash] = (None, None)
-            return value
+        idx = self._key_slot(key)
+        if idx >= 0:
+            return self._remove(idx)
         if default is not None:
             return default
         raise KeyError(f'{key!r} not in dictionary')
 
+    def popitem(self) -> tuple[Any, Any]:
+        """ Remove and return the most recently added item """
+        if not self.len:
+            raise KeyError(f'{self.__class__.__name__} is empty')
+        # Deleted entries at the tail are no longer referenced by the index table so they can be trimmed
+        while self._keys[-1] is _DUMMY:
+            self._hashes.pop()
+            self._keys.pop()
+            self._values.pop()
+        key = self._keys[-1]
+        value = self._remove(self._find_slot(key, self._hashes[-1]))
+        self._hashes.pop()
+        self._keys.pop()
+        self._values.pop()
+        return key, value
+
     def as_dict(self):
         return dict(self._get_values())
 
     def _get_values(self) -> list[tuple[Any, Any]]:
         """ Get values from the dictionary """
-        return [(k, v) for k, v in self.store if k is not None]
+        if self.len == len(self._keys):
+            # Nothing has been deleted so there are no holes to skip
+            return list(zip(self._keys, self._values))
+        return [(k, v) for k, v in zip(self._keys, self._values) if k is not _DUMMY]
+
+    def update(self, other: Iterable = None, **kwargs):
+        """ Update the dictionary from a mapping or iterable of pairs and keyword arguments """
+        if other:
+            self._bulk_insert(other.items() if isinstance(other, dict) else other)
+        if kwargs:
+            self._bulk_insert(kwargs.items())
 
     def setdefault(self, key: Any, default: Any = None) -> Any:
         """ Set values from the dictionary """
@@ -147,7 +351,9 @@ class Dictionary:
 
     def values(self) -> list[Any]:
         """ Get values from the dictionary """
-        return [v for _, v in self._get_values()]
+        if self.len == len(self._keys):
+            return self._values[:]
+        return [v for k, v in zip(self._keys, self._values) if k is not _DUMMY]
 
     def items(self) -> list[tuple[Any, Any]]:
         """ Get items from the dictionary """
@@ -155,7 +361,14 @@ class Dictionary:
 
     def keys(self) -> list[Any]:
         """ Get keys from the dictionary """
-        return [k for k, _ in self._get_values()]
+        if self.len == len(self._keys):
+            return self._keys[:]
+        return [k for k in self._keys if k is not _DUMMY]
+
+    def _get(self, key: Any, default: Any) -> Any:
+        """ Get a value without falling back on __missing__ """
+        position = self._lookup(key)
+        return self._values[position] if position >= 0 else default
 
     def get(self, key: Any, default=None) -> Any:
         """ Get a value from the dictionary """
@@ -167,12 +380,14 @@ class Dictionary:
 
 class DefaultDict(Dictionary):
     """ Default dictionary"""
+    __slots__ = ('_factory_',)
+
     def __init__(self, factory: Callable = None, *args, **kwargs):
         """ Initialize the class """
         if not factory or not isinstance(factory, Callable):
             raise ValueError('factory must be a callable')
         super().__init__(*args, **kwargs)
-        self._kwargs_['factory'] = self._factory_ = factory
+        self._factory_ = factory
 
     def __missing__(self, key: Any) -> Any:
         """ Handle missing key """
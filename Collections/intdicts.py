@@ -0,0 +1,290 @@
+"""
+Dictionary specialised for integer keys and values, backed by NumPy arrays with a Numba compiled probe
+
+:copyright: (c) 2024 by Dan Shernicoff
+"""
+from collections.abc import Iterable
+from operator import index
+from typing import Any
+
+import numpy as np
+from numba import njit
+
+from .dicts import Dictionary
+
+_EMPTY = -1  # Index table slot that has never been used
+_DELETED = -2  # Index table slot whose entry was deleted
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)  # 2**64 divided by the golden ratio
+_INT64_MIN = -1 << 63
+_INT64_MAX = (1 << 63) - 1
+
+
+@njit(cache=True)
+def _home_int(key, shift):
+    """ Get the Fibonacci hashed home slot of an integer key """
+    return np.int64((np.uint64(key) * _GOLDEN) >> np.uint64(shift))
+
+
+@njit(cache=True)
+def _probe_int(indices, shift, key):
+    """
+    Find the slot in the index table for an integer key using linear probing.
+
+    Returns the slot pointing at the key's entry if present, otherwise the first free slot (deleted
+    or empty) on the key's probe chain.
+    """
+    mask = indices.shape[0] - 1
+    idx = _home_int(key, shift)
+    free = -1
+    for _ in range(mask + 1):
+        position = indices[idx, 0]
+        if position == _EMPTY:
+            return idx if free < 0 else free
+        if position == _DELETED:
+            if free < 0:
+                free = idx
+        elif indices[idx, 1] == key:
+            return idx
+        idx = (idx + 1) & mask
+    return free
+
+
+@njit(cache=True)
+def _lookup_int(indices, shift, key):
+    """ Get the position of an integer key's entry or -1 if it is not in the table """
+    idx = _probe_int(indices, shift, key)
+    return indices[idx, 0] if idx >= 0 and indices[idx, 0] >= 0 else -1
+
+
+@njit(cache=True)
+def _insert_many_int(indices, keys, values, live, shift, entries, pairs):
+    """
+    Insert rows of (key, value) from `pairs` after the first `entries` entries, overwriting keys that
+    are already present. The table must have room for every row.
+
+    Returns the new number of entries and how many empty slots were filled.
+    """
+    filled = 0
+    for row in range(pairs.shape[0]):
+        key = pairs[row, 0]
+        idx = _probe_int(indices, shift, key)
+        position = indices[idx, 0]
+        if position >= 0:
+            values[position] = pairs[row, 1]
+            continue
+        if position == _EMPTY:
+            filled += 1
+        indices[idx, 0] = entries
+        indices[idx, 1] = key
+        keys[entries] = key
+        values[entries] = pairs[row, 1]
+        live[entries] = True
+        entries += 1
+    return entries, filled
+
+
+@njit(cache=True)
+def _rebuild_int(indices, keys, shift):
+    """ Point an empty index table at every entry in `keys` """
+    mask = indices.shape[0] - 1
+    for position in range(keys.shape[0]):
+        idx = _home_int(keys[position], shift)
+        while indices[idx, 0] != _EMPTY:
+            idx = (idx + 1) & mask
+        indices[idx, 0] = position
+        indices[idx, 1] = keys[position]
+
+
+def _as_int64(value: Any) -> int:
+    """ Convert an int-like value to an int, raising OverflowError if it does not fit in an int64 """
+    value = index(value)
+    if not _INT64_MIN <= value <= _INT64_MAX:
+        raise OverflowError(f'{value} does not fit in an int64')
+    return value
+
+
+class IntDictionary(Dictionary):
+    """
+    Dictionary of int64 keys to int64 values.
+
+    Entries are kept in insertion order in NumPy arrays and the probe loop is compiled with Numba, so
+    lookups do not box every key they compare against. Each index table slot holds an entry position
+    next to a copy of its key, so a probe reads one row instead of jumping to the entry arrays.
+    """
+    __slots__ = ('used', '_live', 'entries')
+
+    def _init_store(self, max_len: int):
+        """ Set up an empty index table with `max_len` slots """
+        assert max_len >= 2, 'max_len must be at least 2'
+        self.len = 0
+        self.used = 0
+        self.entries = 0
+        self.max_len = max_len
+        self.mask = max_len - 1
+        self.shift = 65 - max_len.bit_length()
+        self.indices = np.full((max_len, 2), _EMPTY, dtype=np.int64)
+        self._keys = np.zeros(max_len, dtype=np.int64)
+        self._values = np.zeros(max_len, dtype=np.int64)
+        self._live = np.zeros(max_len, dtype=np.bool_)
+
+    def _find_slot(self, key: Any, key_hash: int = None) -> int:
+        """ Find the slot in the index table for an int64 key using the compiled probe """
+        return _probe_int(self.indices, self.shift, key)
+
+    def _key_slot(self, key: Any) -> int:
+        """ Get the slot pointing at the key's entry or -1 if it is not in the dictionary """
+        try:
+            key = _as_int64(key)
+        except (TypeError, OverflowError):
+            return -1
+        idx = self._find_slot(key)
+        return idx if self.indices.item(idx, 0) >= 0 else -1
+
+    def _lookup(self, key: Any) -> int:
+        """ Get the position of the key's entry or -1 if it is not in the dictionary """
+        try:
+            key = index(key)
+        except TypeError:
+            return -1
+        if not _INT64_MIN <= key <= _INT64_MAX:
+            return -1
+        # Plain ints in the int64 range go straight to the compiled lookup without being boxed by NumPy
+        return _lookup_int(self.indices, self.shift, key)
+
+    def _resize(self, new_size: int):
+        """ Rebuild the index table with `new_size` slots, dropping deleted entries """
+        assert new_size & (new_size - 1) == 0, 'new_size must be a power of 2'
+        live = self._live[:self.entries]
+        keys = self._keys[:self.entries][live]
+        values = self._values[:self.entries][live]
+        count = self.len
+        self._init_store(new_size)
+        self._keys[:count] = keys
+        self._values[:count] = values
+        self._live[:count] = True
+        self.len = self.used = self.entries = count
+        _rebuild_int(self.indices, self._keys[:count], self.shift)
+
+    def __setitem__(self, key, value):
+        """ Add item to the dictionary """
+        # Convert both up front so an out of range int raises before any state changes
+        key = _as_int64(key)
+        value = _as_int64(value)
+        idx = self._find_slot(key)
+        position = self.indices.item(idx, 0)
+        if position >= 0:
+            self._values[position] = value
+            return
+        overloaded = position == _EMPTY and (self.used + 1) / self.max_len > self.MAX_LOAD
+        if overloaded or self.entries >= self.max_len:
+            self._make_room()
+            idx = self._find_slot(key)
+            position = _EMPTY
+        if position == _EMPTY:
+            self.used += 1
+        self.len += 1
+        position = self.entries
+        self.indices[idx] = position, key
+        self._keys[position] = key
+        self._values[position] = value
+        self._live[position] = True
+        self.entries += 1
+
+    def _bulk_insert(self, kv_pairs: Iterable, count: int = None):
+        """
+        Add many pairs at once.
+
+        The pairs are converted to one int64 array and inserted by a single compiled loop, after at most
+        one resize. Pairs NumPy cannot turn into int64 rows go through __setitem__ one at a time so they
+        raise the same errors a single insert would.
+        """
+        kv_pairs = list(kv_pairs)
+        try:
+            pairs = np.array(kv_pairs)
+        except ValueError:  # Rows of different shapes
+            pairs = None
+        if pairs is None or pairs.ndim != 2 or pairs.shape[1] != 2 or not np.can_cast(pairs.dtype, np.int64):
+            for key, value in kv_pairs:
+                self[key] = value
+            return
+        count = len(pairs)
+        if (self.used + count) / self.max_len > self.MAX_LOAD or self.entries + count > self.max_len:
+            self._resize(max(self.max_len, self._size_for(self.len + count)))
+        entries, filled = _insert_many_int(self.indices, self._keys, self._values, self._live, self.shift,
+                                           self.entries, pairs.astype(np.int64, copy=False))
+        self.len += entries - self.entries
+        self.used += filled
+        self.entries = entries
+
+    def __getitem__(self, key):
+        """ Get item from the dictionary """
+        position = self._lookup(key)
+        if position >= 0:
+            return self._values.item(position)
+        raise KeyError(f'{key} not found in {self.__class__.__name__}')
+
+    def getmany(self, keys: Iterable[int]) -> np.ndarray:
+        """
+        Look up a batch of keys, returning their values as an int64 array of the same shape.
+
+        Keys found in their home slot are resolved with vectorised NumPy indexing; only the rest go
+        through the probe one at a time. Raises TypeError unless the keys are integers and KeyError if
+        any key is missing, including keys outside the int64 range.
+        """
+        original, keys = keys, np.asarray(keys)
+        if keys.size and not np.issubdtype(keys.dtype, np.integer):
+            # NumPy turns ints outside the int64 range into floats or objects. Like __getitem__, treat
+            # those as missing keys rather than the wrong type
+            for key in np.asarray(original, dtype=object).flat:
+                if isinstance(key, int) and not _INT64_MIN <= key <= _INT64_MAX:
+                    raise KeyError(f'{key} not found in {self.__class__.__name__}')
+            raise TypeError(f'keys must be integers, not {keys.dtype}')
+        shape = keys.shape
+        keys = keys.ravel()
+        if keys.dtype == np.uint64 and keys.size and keys.max() > _INT64_MAX:
+            raise KeyError(f'{keys[keys > _INT64_MAX][0]} not found in {self.__class__.__name__}')
+        keys = keys.astype(np.int64, copy=False)
+        homes = ((keys.astype(np.uint64) * _GOLDEN) >> np.uint64(self.shift)).astype(np.int64)
+        slots = self.indices[homes]
+        positions = slots[:, 0]
+        hits = (positions >= 0) & (slots[:, 1] == keys)
+        values = np.empty(keys.shape, dtype=np.int64)
+        values[hits] = self._values[positions[hits]]
+        for i in np.flatnonzero(~hits):
+            values[i] = self[keys.item(i)]
+        return values.reshape(shape)
+
+    def _remove(self, idx: int) -> Any:
+        """ Remove the entry referenced by slot `idx` and return its value """
+        position = self.indices.item(idx, 0)
+        self.indices[idx, 0] = _DELETED
+        self._live[position] = False
+        self.len -= 1
+        return self._values.item(position)
+
+    def popitem(self) -> tuple[int, int]:
+        """ Remove and return the most recently added item """
+        if not self.len:
+            raise KeyError(f'{self.__class__.__name__} is empty')
+        while not self._live[self.entries - 1]:
+            self.entries -= 1
+        key = self._keys.item(self.entries - 1)
+        value = self._remove(self._find_slot(key))
+        self.entries -= 1
+        return key, value
+
+    def __iter__(self):
+        """ Iterate over the dictionary """
+        yield from self._get_values()
+
+    def _get_values(self) -> list[tuple[int, int]]:
+        """ Get values from the dictionary """
+        return list(zip(self.keys(), self.values()))
+
+    def keys(self) -> list[int]:
+        """ Get keys from the dictionary """
+        return self._keys[:self.entries][self._live[:self.entries]].tolist()
+
+    def values(self) -> list[int]:
+        """ Get values from the dictionary """
+        return self._values[:self.entries][self._live[:self.entries]].tolist()
@@ -0,0 +1,200 @@
+"""
+Tests for the dictionary types
+
+:copyright: (c) 2024 by Dan Shernicoff
+"""
+import random
+
+import pytest
+
+from Collections.dicts import Dictionary, DefaultDict
+
+
+class CollidingKey:
+    """ Key whose hash only takes three values, to force long probe chains """
+    def __init__(self, value: int):
+        self.value = value
+
+    def __hash__(self):
+        return self.value % 3
+
+    def __eq__(self, other):
+        return isinstance(other, CollidingKey) and other.value == self.value
+
+    def __repr__(self):
+        return f'CollidingKey({self.value})'
+
+
+KEY_TYPES = {
+    'int': lambda n: n,
+    'str': str,
+    'strided': lambda n: n * 1024,
+    'colliding': CollidingKey,
+}
+
+
+@pytest.mark.parametrize('max_len', [0, 1, 3, 6])
+def test_invalid_max_len(max_len):
+    with pytest.raises(ValueError):
+        Dictionary(max_len=max_len)
+
+
+@pytest.mark.parametrize('multiplier', [0, 1, 3])
+def test_invalid_multiplier(multiplier):
+    with pytest.raises(ValueError):
+        Dictionary(multiplier=multiplier)
+
+
+def test_multiplier():
+    d = Dictionary(multiplier=4)
+    for n in range(20):
+        d[n] = n
+    assert d.max_len == 64
+    assert d == {n: n for n in range(20)}
+
+
+def test_smallest_table():
+    d = Dictionary(max_len=2)
+    for n in range(10):
+        d[f'k{n}'] = n
+    assert d == {f'k{n}': n for n in range(10)}
+
+
+def test_overwrite_does_not_resize():
+    d = Dictionary([(1, 1), (2, 2)])
+    for n in range(100):
+        d[2] = n
+    assert d.max_len == Dictionary.START_LEN
+    assert len(d) == 2
+    assert d[2] == 99
+
+
+def test_delete_and_reinsert_does_not_grow_entries():
+    d = Dictionary()
+    for n in range(1000):
+        d['a'] = n
+        del d['a']
+    assert len(d) == 0
+    assert len(d._keys) <= d.max_len == Dictionary.START_LEN
+
+
+@pytest.mark.parametrize('make_key', KEY_TYPES.values(), ids=KEY_TYPES.keys())
+def test_matches_dict(make_key):
+    rnd = random.Random(1)
+    d, expected = Dictionary(), {}
+    for _ in range(5000):
+        key = make_key(rnd.randrange(300))
+        op = rnd.random()
+        if op < 0.5:
+            d[key] = expected[key] = rnd.random()
+        elif op < 0.65:
+            assert (key in d) == (key in expected)
+            if key in expected:
+                del d[key]
+                del expected[key]
+            else:
+                with pytest.raises(KeyError):
+                    del d[key]
+        elif op < 0.75:
+            assert d.get(key, 'missing') == expected.get(key, 'missing')
+        elif op < 0.85:
+            if key in expected:
+                assert d.pop(key) == expected.pop(key)
+        elif op < 0.95:
+            if expected:
+                assert d.popitem() == expected.popitem()
+        else:
+            extra = [(make_key(rnd.randrange(300)), n) for n in range(10)]
+            d.update(extra)
+            expected.update(extra)
+        assert len(d) == len(expected)
+    assert d.items() == list(expected.items())
+    assert list(d) == list(expected.items())
+    assert d.keys() == list(expected.keys())
+    assert d.values() == list(expected.values())
+    assert d == expected
+
+
+def test_iteration_is_reentrant():
+    d = Dictionary([(n, n) for n in range(5)])
+    assert [(a, b) for a, _ in d for b, _ in d] == [(a, b) for a in range(5) for b in range(5)]
+
+
+def test_equality():
+    d = Dictionary([(n, str(n)) for n in range(20)])
+    other = Dictionary([(n, str(n)) for n in reversed(range(20))])
+    assert d == other
+    assert d == {n: str(n) for n in range(20)}
+    assert d != 5
+    other[3] = 'x'
+    assert d != other
+
+
+def test_equality_with_nan_values():
+    nan = float('nan')
+    d = Dictionary([(1, nan)])
+    assert d == d
+    assert d == Dictionary([(1, nan)])
+    assert d == {1: nan}
+    assert d != {1: float('nan')}
+
+
+def test_equality_does_not_call_missing():
+    dd = DefaultDict(int)
+    assert dd != Dictionary([(1, 0)])
+    assert len(dd) == 0
+
+
+def test_update_and_ior():
+    d = Dictionary([(1, 1)])
+    d.update({2: 2}, x=3)
+    d |= Dictionary([(4, 4)])
+    assert d.items() == [(1, 1), (2, 2), ('x', 3), (4, 4)]
+
+
+def test_none_key_rejected():
+    with pytest.raises(ValueError):
+        Dictionary()[None] = 1
+    d = Dictionary([(1, 1)])
+    with pytest.raises(ValueError):
+        d.update([(2, 2), (None, 3)])
+    assert d == {1: 1, 2: 2}
+
+
+def test_fromkeys():
+    d = Dictionary.fromkeys(range(1000), 'v')
+    assert len(d) == 1000
+    assert d.max_len == 2048
+    assert d.keys() == list(range(1000))
+    assert Dictionary.fromkeys(iter('abca')) == {'a': None, 'b': None, 'c': None}
+
+
+def test_popitem():
+    d = Dictionary([(n, n) for n in range(10)])
+    del d[9]
+    del d[8]
+    assert d.popitem() == (7, 7)
+    assert len(d) == 7
+    assert d.keys() == list(range(7))
+
+
+def test_popitem_empty():
+    with pytest.raises(KeyError):
+        Dictionary().popitem()
+
+
+def test_clear():
+    d = Dictionary([(n, n) for n in range(100)])
+    d.clear()
+    assert len(d) == 0
+    assert list(d) == []
+    d[1] = 1
+    assert d[1] == 1
+
+
+def test_default_dict():
+    dd = DefaultDict(list)
+    for n in range(50):
+        dd[n % 7].append(n)
+    assert len(dd) == 7
+    assert dd[3] == list(range(3, 50, 7))
@@ -0,0 +1,143 @@
+"""
+Tests for IntDictionary, skipped when numpy or numba are not installed
+
+:copyright: (c) 2024 by Dan Shernicoff
+"""
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('numba')
+
+from Collections.intdicts import IntDictionary  # noqa: E402
+
+
+def test_matches_dict():
+    rnd = random.Random(2)
+    d, expected = IntDictionary(), {}
+    for _ in range(10000):
+        key = rnd.randrange(-500, 500)
+        op = rnd.random()
+        if op < 0.5:
+            d[key] = expected[key] = rnd.randrange(1 << 40)
+        elif op < 0.7:
+            assert (key in d) == (key in expected)
+            if key in expected:
+                del d[key]
+                del expected[key]
+        elif op < 0.85:
+            assert d.get(key, 'missing') == expected.get(key, 'missing')
+        elif expected:
+            assert d.popitem() == expected.popitem()
+        assert len(d) == len(expected)
+    assert d.items() == list(expected.items())
+    assert d == expected
+
+
+def test_values_are_ints():
+    d = IntDictionary([(1, 2)])
+    assert type(d[1]) is int
+    assert d.pop(3, 5) == 5
+    assert 'a' not in d
+
+
+def test_extreme_keys():
+    d = IntDictionary()
+    for key in (-5, 2 ** 63 - 1, -2 ** 63):
+        d[key] = 1
+    assert d.keys() == [-5, 2 ** 63 - 1, -2 ** 63]
+
+
+def test_out_of_range_leaves_dictionary_unchanged():
+    d = IntDictionary([(1, 1)])
+    with pytest.raises(OverflowError):
+        d[5] = 2 ** 70
+    with pytest.raises(OverflowError):
+        d[2 ** 70] = 5
+    with pytest.raises(OverflowError):
+        d[1] = -2 ** 70
+    assert len(d) == 1
+    assert 5 not in d
+    assert 2 ** 70 not in d
+    d[6] = 6
+    assert d.items() == [(1, 1), (6, 6)]
+
+
+def test_bulk_insert():
+    d = IntDictionary([(n, n) for n in range(100)])
+    for n in range(0, 100, 3):
+        del d[n]
+    extra = [(n, -n) for n in range(50, 150)] + [(7, 1), (7, 2), (True, 5)]
+    d.update(extra)
+    expected = {n: n for n in range(100) if n % 3}
+    expected.update(extra)
+    assert d.items() == list(expected.items())
+    assert d.copy() == expected
+
+
+def test_bulk_insert_rejects_what_setitem_rejects():
+    d = IntDictionary([(1, 1)])
+    with pytest.raises(TypeError):
+        d.update([(2, 2), (3.5, 3)])
+    with pytest.raises(TypeError):
+        d.update([(4, [4])])
+    with pytest.raises(OverflowError):
+        d.update([(5, 2 ** 63)])
+    assert d == {1: 1, 2: 2}
+
+
+def test_delete_and_reinsert_does_not_grow_entries():
+    d = IntDictionary()
+    for n in range(1000):
+        d[7] = n
+        del d[7]
+    assert d.entries <= d.max_len
+
+
+def test_invalid_max_len():
+    with pytest.raises(ValueError):
+        IntDictionary(max_len=1)
+
+
+def test_smallest_table():
+    d = IntDictionary(max_len=2)
+    for n in range(10):
+        d[n * 1024] = n
+    assert d == {n * 1024: n for n in range(10)}
+    assert d.getmany([9216]).tolist() == [9]
+
+
+def test_getmany():
+    d = IntDictionary([(k, k * 3) for k in range(0, 5000 * 7, 7)])
+    for k in range(0, 1000, 14):
+        del d[k]
+    keys = [k for k in range(0, 5000 * 7, 7) if k >= 1000 or k % 14] * 2
+    assert d.getmany(keys).tolist() == [k * 3 for k in keys]
+    assert d.getmany([]).shape == (0,)
+    with pytest.raises(KeyError):
+        d.getmany([7, 14])
+
+
+def test_getmany_shapes():
+    d = IntDictionary([(k, k * 2) for k in range(10)])
+    assert d.getmany([[1, 2], [3, 4]]).tolist() == [[2, 4], [6, 8]]
+    assert d.getmany(np.arange(8).reshape(2, 4)[:, ::2]).tolist() == [[0, 4], [8, 12]]
+    assert d.getmany(7).tolist() == 14
+    assert d.getmany(np.array([1, 2], dtype=np.int8)).tolist() == [2, 4]
+
+
+@pytest.mark.parametrize('keys', [[7.9], [1.5], ['7'], [7, None]])
+def test_getmany_rejects_non_int_keys(keys):
+    d = IntDictionary([(1, 1), (7, 7)])
+    with pytest.raises(TypeError):
+        d.getmany(keys)
+
+
+@pytest.mark.parametrize('key', [2 ** 63, -2 ** 63 - 1, 2 ** 64, 2 ** 70])
+def test_getmany_out_of_range_is_missing(key):
+    d = IntDictionary([(1, 1)])
+    with pytest.raises(KeyError):
+        d[key]
+    with pytest.raises(KeyError):
+        d.getmany([1, key])